@@ -14,21 +14,21 @@ import json
 import time
 import tempfile
 import shutil
-import requests
+import uuid
+import socket
+import ctypes
 import threading
-from bpy.props import StringProperty, IntProperty, PointerProperty, BoolProperty
+import functools
+import contextlib
+from bpy.props import StringProperty, IntProperty, PointerProperty, BoolProperty, EnumProperty, FloatProperty
 from bpy.types import Operator, Panel, PropertyGroup, AddonPreferences
 
-# Import selenium modules
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    SELENIUM_AVAILABLE = True
-except ImportError:
-    SELENIUM_AVAILABLE = False
+# Import selenium-backed HuggingFace automation
+from . import backends
+from .backends import SELENIUM_AVAILABLE, atomic_write, cache_asset_path
+from .jobqueue import JobQueue, QueueWaitError, relative_path
+from .cassette import Cassette, CassetteError
+from . import consolidate
 
 # Import OpenAI API
 try:
@@ -42,10 +42,583 @@ addon_dir = os.path.dirname(os.path.realpath(__file__))
 
 # Global variables
 TEMP_DIR = tempfile.gettempdir()
-JSON_FILE_PATH = os.path.join(TEMP_DIR, "scene_generated.json")
-SCENE_FOLDER = os.path.join(TEMP_DIR, "Scene")
-MODELS_FOLDER = os.path.join(TEMP_DIR, "3D_Models")
+WORKSPACE_DIR_NAME = "ai_scene_generator"
+JSON_FILE_NAME = "scene_generated.json"
+SCENE_FOLDER_NAME = "Scene"
+MODELS_FOLDER_NAME = "3D_Models"
+LOCK_FILE_NAME = ".active"
+DIFF_FILE_NAME = "scene_diff.json"
+# Run workspaces locked by this Blender process, by run id
+LOCKED_RUNS = {}
 ACTIVE_DRIVER = None
+# Driver that already has the image Space open from the warm-up
+WARM_IMAGE_DRIVER = None
+# Readiness of the image and 3D Spaces and of the HuggingFace session, shown in the panel
+BACKEND_STATUS = {}
+# Warm-up probe threads of the image and 3D Spaces, by stage
+BACKEND_PROBES = {}
+# Warm-up login thread, and the event ending the warm-up of the current run
+WARM_SESSION = None
+WARM_STOP = None
+WARM_LOCK = threading.Lock()
+
+# Structured outputs (json_schema response format) need a gpt-4o class model
+OPENAI_MODEL = "gpt-4o"
+MAX_REPAIR_ATTEMPTS = 2
+# Seconds to wait for any worker to claim a queued job before giving up
+WORKER_CLAIM_TIMEOUT = 120
+
+# === Scene Schema ===
+SCENE_OBJECT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {
+            "type": "string",
+            "description": "Unique snake_case identifier, letters, digits and underscores only",
+        },
+        "type": {
+            "type": "string",
+            "description": "Object category, e.g. tree, furniture, decoration",
+        },
+        "position": {
+            "type": "object",
+            "properties": {
+                "x": {"type": "number"},
+                "y": {"type": "number"},
+                "z": {"type": "number"},
+            },
+            "required": ["x", "y", "z"],
+            "additionalProperties": False,
+        },
+        "prompt": {
+            "type": "string",
+            "description": (
+                "Detailed text-to-image prompt for a single, complete, centered object "
+                "with a clear contour, fully visible, isolated on a plain white background, "
+                "studio-lit. No scenery or background elements."
+            ),
+        },
+    },
+    "required": ["name", "type", "position", "prompt"],
+    "additionalProperties": False,
+}
+
+SCENE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scene": {"type": "string", "description": "Short snake_case scene name"},
+        "objects": {"type": "array", "items": SCENE_OBJECT_SCHEMA},
+    },
+    "required": ["scene", "objects"],
+    "additionalProperties": False,
+}
+
+OBJECT_NAME_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-")
+
+def json_schema_format(name, schema):
+    """Wrap a JSON schema as an OpenAI strict structured-output response format"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": True},
+    }
+
+def validate_scene_object(obj):
+    """Return a list of problems with a single scene object (empty if valid)"""
+    if not isinstance(obj, dict):
+        return ["object is not a JSON object"]
+
+    errors = []
+    name = obj.get("name")
+    if not isinstance(name, str) or not name.strip():
+        errors.append("name must be a non-empty string")
+    elif not set(name) <= OBJECT_NAME_CHARS:
+        errors.append("name may only contain letters, digits, '_' and '-'")
+
+    for field in ("type", "prompt"):
+        value = obj.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(f"{field} must be a non-empty string")
+
+    position = obj.get("position")
+    if not isinstance(position, dict):
+        errors.append("position must be an object with x, y and z")
+    else:
+        for axis in ("x", "y", "z"):
+            value = position.get(axis)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                errors.append(f"position.{axis} must be a number")
+
+    return errors
+
+def validate_scene(data):
+    """Validate a scene and return {object index: [problems]} for invalid objects"""
+    invalid = {}
+    seen_names = set()
+    for index, obj in enumerate(data.get("objects", [])):
+        errors = validate_scene_object(obj)
+        if not errors:
+            if obj["name"] in seen_names:
+                errors.append(f"duplicate name '{obj['name']}'")
+            seen_names.add(obj["name"])
+        if errors:
+            invalid[index] = errors
+    return invalid
+
+def parse_scene_reply(content):
+    """Parse an LLM reply into a scene dict, falling back to an empty scene"""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return {"scene": "", "objects": []}
+    if not isinstance(data, dict):
+        return {"scene": "", "objects": []}
+    if not isinstance(data.get("objects"), list):
+        data["objects"] = []
+    return data
+
+def diff_scenes(previous, current):
+    """Compare two scenes object by object, matching objects by name"""
+    previous_objects = {obj["name"]: obj for obj in previous.get("objects", [])}
+    diff = {"unchanged": [], "moved": [], "changed": [], "added": [], "removed": []}
+
+    for obj in current.get("objects", []):
+        old = previous_objects.pop(obj["name"], None)
+        if old is None:
+            diff["added"].append(obj["name"])
+        elif old.get("type") != obj["type"] or old.get("prompt") != obj["prompt"]:
+            diff["changed"].append(obj["name"])
+        elif old.get("position") != obj["position"]:
+            diff["moved"].append(obj["name"])
+        else:
+            diff["unchanged"].append(obj["name"])
+
+    diff["removed"] = list(previous_objects)
+    return diff
+
+# === Run Workspaces ===
+def get_workspace_root(preferences):
+    """Return the folder holding all run workspaces and the shared cache"""
+    root = bpy.path.abspath(preferences.workspace_root) if preferences.workspace_root else ""
+    return root or os.path.join(TEMP_DIR, WORKSPACE_DIR_NAME)
+
+class RunWorkspace:
+    """Isolated folder for the artifacts of a single generation run"""
+
+    def __init__(self, root, run_id):
+        self.root = root
+        self.run_id = run_id
+        self.path = os.path.join(root, "runs", run_id)
+        self.json_path = os.path.join(self.path, JSON_FILE_NAME)
+        self.scene_folder = os.path.join(self.path, SCENE_FOLDER_NAME)
+        self.models_folder = os.path.join(self.path, MODELS_FOLDER_NAME)
+        self.cache_folder = os.path.join(root, "cache")
+
+    @classmethod
+    def create(cls, root):
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        workspace = cls(root, run_id)
+        os.makedirs(workspace.path)
+        # Held from the start so no other instance collects the run between steps
+        workspace.lock()
+        return workspace
+
+    def variant_path(self, index):
+        return os.path.join(self.path, f"scene_generated_{index}.json")
+
+    def variant_indices(self):
+        """Numbers of the extra scene variants saved next to the main scene"""
+        indices = []
+        while os.path.exists(self.variant_path(len(indices) + 2)):
+            indices.append(len(indices) + 2)
+        return indices
+
+    def cache_path(self, kind, key, extension):
+        return cache_asset_path(self.cache_folder, kind, key, extension)
+
+    def fetch_cached(self, cache_path, target_path):
+        """Copy a cached asset into this run, returning False on a cache miss"""
+        if not os.path.exists(cache_path):
+            return False
+        os.utime(cache_path)
+        with open(cache_path, 'rb') as f:
+            atomic_write(target_path, f.read())
+        return True
+
+    def store_cached(self, cache_path, data):
+        """Publish an asset to the shared cache; existing entries are never rewritten"""
+        if not os.path.exists(cache_path):
+            atomic_write(cache_path, data)
+
+    def load_diff(self):
+        """Return the diff against the previous run, or None for a full rebuild"""
+        diff_path = os.path.join(self.path, DIFF_FILE_NAME)
+        if not os.path.exists(diff_path):
+            return None
+        with open(diff_path, 'r') as f:
+            return json.load(f)
+
+    def reuse_previous(self, diff, name, folder_name, extension):
+        """Copy an unchanged object's asset from the previous run into this one"""
+        if not diff or name not in diff["unchanged"] + diff["moved"]:
+            return False
+        previous = RunWorkspace(self.root, diff["previous_run_id"])
+        source_path = os.path.join(previous.path, folder_name, f"{name}{extension}")
+        if not os.path.exists(source_path):
+            return False
+        with open(source_path, 'rb') as f:
+            atomic_write(os.path.join(self.path, folder_name, f"{name}{extension}"), f.read())
+        return True
+
+    def lock(self):
+        """Mark the run as held by this process so garbage collection skips it"""
+        atomic_write(os.path.join(self.path, LOCK_FILE_NAME), f"{socket.gethostname()} {os.getpid()}")
+        LOCKED_RUNS[self.run_id] = self
+
+    def unlock(self):
+        LOCKED_RUNS.pop(self.run_id, None)
+        lock_path = os.path.join(self.path, LOCK_FILE_NAME)
+        if os.path.exists(lock_path):
+            os.remove(lock_path)
+
+def release_run_locks(keep=()):
+    """Unlock the runs held by this process, except those in keep"""
+    for run_id, workspace in list(LOCKED_RUNS.items()):
+        if run_id not in keep:
+            workspace.unlock()
+
+def get_run_workspace(context):
+    """Return the workspace of the scene's current run, or None if there is none"""
+    run_id = context.scene.scene_gen.run_id
+    if not run_id:
+        return None
+    preferences = context.preferences.addons[__name__].preferences
+    workspace = RunWorkspace(get_workspace_root(preferences), run_id)
+    return workspace if os.path.isdir(workspace.path) else None
+
+def is_process_alive(pid):
+    """Check whether a process on this machine is still running"""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        # Signal 0 is CTRL_C_EVENT on Windows, so query the process instead
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        ERROR_ACCESS_DENIED = 5
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # Processes of other users deny access but are running
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def is_run_locked(run_path, max_age):
+    """Check whether a run is held by a live process
+
+    Locks from other machines sharing the workspace cannot be checked, so they
+    are honoured until they are older than max_age seconds.
+    """
+    lock_path = os.path.join(run_path, LOCK_FILE_NAME)
+    try:
+        with open(lock_path, 'r') as f:
+            host, pid = f.read().split()
+        if host != socket.gethostname():
+            return time.time() - os.path.getmtime(lock_path) < max_age
+        return is_process_alive(int(pid))
+    except (OSError, ValueError):
+        return False
+
+def folder_stats(folder):
+    """Return (total size in bytes, newest modification time) of a folder tree"""
+    size = 0
+    newest = os.path.getmtime(folder)
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            size += stat.st_size
+            newest = max(newest, stat.st_mtime)
+    return size, newest
+
+def collect_workspaces(root, max_age_days, max_size_mb, keep=()):
+    """Delete old run workspaces and cache entries by age, then by total size"""
+    runs_folder = os.path.join(root, "runs")
+    cache_folder = os.path.join(root, "cache")
+    now = time.time()
+    max_age = max_age_days * 86400
+    max_size = max_size_mb * 1024 * 1024
+
+    runs = []
+    if os.path.isdir(runs_folder):
+        for run_id in os.listdir(runs_folder):
+            run_path = os.path.join(runs_folder, run_id)
+            if not os.path.isdir(run_path):
+                continue
+            size, newest = folder_stats(run_path)
+            runs.append((newest, size, run_id, run_path))
+
+    cache_entries = []
+    if os.path.isdir(cache_folder):
+        for dirpath, _, filenames in os.walk(cache_folder):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                cache_entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _, _ in runs) + sum(size for _, size, _ in cache_entries)
+    removed = 0
+
+    for newest, size, run_id, run_path in sorted(runs):
+        if run_id in keep or is_run_locked(run_path, max_age):
+            continue
+        if now - newest > max_age or total > max_size:
+            shutil.rmtree(run_path, ignore_errors=True)
+            total -= size
+            removed += 1
+
+    for mtime, size, path in sorted(cache_entries):
+        if now - mtime <= max_age and total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    return removed
+
+def prepare_images(workspace, use_cache=True):
+    """Fill the run's Scene folder from the previous run and the cache, returning objects still needing an image"""
+    with open(workspace.json_path, 'r') as file:
+        data = json.load(file)
+
+    diff = workspace.load_diff()
+    pending = []
+    for obj in data["objects"]:
+        name = obj["name"]
+        image_path = os.path.join(workspace.scene_folder, f"{name}.webp")
+        cache_path = workspace.cache_path("images", obj["prompt"], ".webp")
+        if workspace.reuse_previous(diff, name, SCENE_FOLDER_NAME, ".webp"):
+            print(f"Kept image of unchanged object {name}")
+        elif use_cache and workspace.fetch_cached(cache_path, image_path):
+            print(f"Reused cached image for {name}")
+        else:
+            pending.append(obj)
+    return pending
+
+def prepare_models(workspace, use_cache=True):
+    """Fill the run's model folder from the previous run and the cache, returning
+    (name, image path, model path, cache path) for images still needing a model"""
+    diff = workspace.load_diff()
+    pending = []
+    for file_name in os.listdir(workspace.scene_folder):
+        if not file_name.endswith('.webp'):
+            continue
+        name = os.path.splitext(file_name)[0]
+        image_path = os.path.join(workspace.scene_folder, file_name)
+        model_path = os.path.join(workspace.models_folder, f"{name}.glb")
+        if workspace.reuse_previous(diff, name, MODELS_FOLDER_NAME, ".glb"):
+            print(f"Kept model of unchanged object {name}")
+            continue
+        with open(image_path, 'rb') as f:
+            cache_path = workspace.cache_path("models", f.read(), ".glb")
+        if use_cache and workspace.fetch_cached(cache_path, model_path):
+            print(f"Reused cached model for {name}")
+            continue
+        pending.append((name, image_path, model_path, cache_path))
+    return pending
+
+def enqueue_image_jobs(queue, workspace, use_cache=True, chain=False):
+    """Queue an image job per object, chaining into a 3D job if requested"""
+    pending = prepare_images(workspace, use_cache)
+    
+    # Images that already exist go straight to the 3D stage. They are queued before
+    # any image job, so that images workers finish meanwhile are not queued twice
+    queued = enqueue_model_jobs(queue, workspace, use_cache) if chain else 0
+    for obj in pending:
+        name = obj["name"]
+        # Paths are relative to the workspace root so workers can mount it anywhere
+        payload = {
+            "prompt": obj["prompt"],
+            "output_path": relative_path(workspace.root, os.path.join(workspace.scene_folder, f"{name}.webp")),
+            "cache_path": relative_path(workspace.root, workspace.cache_path("images", obj["prompt"], ".webp")),
+        }
+        if chain:
+            payload["model"] = {
+                "output_path": relative_path(workspace.root, os.path.join(workspace.models_folder, f"{name}.glb")),
+                "cache_folder": relative_path(workspace.root, workspace.cache_folder),
+                "use_cache": use_cache,
+            }
+        queue.enqueue(workspace.run_id, "image", name, payload)
+        queued += 1
+    return queued
+
+def enqueue_model_jobs(queue, workspace, use_cache=True):
+    """Queue a 3D job for every image of the run that still needs a model"""
+    queued = 0
+    for name, image_path, model_path, cache_path in prepare_models(workspace, use_cache):
+        queue.enqueue(workspace.run_id, "model", name, {
+            "image_path": relative_path(workspace.root, image_path),
+            "output_path": relative_path(workspace.root, model_path),
+            "cache_path": relative_path(workspace.root, cache_path),
+            "use_cache": use_cache,
+        })
+        queued += 1
+    return queued
+
+# === Backend Warm-up ===
+def probe_backend(kind, space_id, stop):
+    """Wake a Space and record its runtime stage until it is ready or the run ends"""
+    def set_status(stage):
+        # Probes of a finished run must not overwrite the status of the next one
+        if not stop.is_set():
+            BACKEND_STATUS[kind] = stage
+    try:
+        backends.wait_until_ready(
+            space_id, on_status=lambda stage: set_status(stage or "UNREACHABLE"), stop=stop
+        )
+    except CassetteError as e:
+        # Replays with fewer recorded probes than this run needs
+        print(f"Cassette has no further {kind} backend probes: {e}")
+        set_status("NOT RECORDED")
+
+def start_warm_up(preferences, login=True):
+    """Start waking the image and 3D Spaces, and optionally logging in, in the background"""
+    global WARM_SESSION, WARM_STOP
+    WARM_STOP = threading.Event()
+    BACKEND_STATUS.clear()
+    for kind, space_id in (("image", backends.IMAGE_SPACE_ID), ("model", backends.MODEL_SPACE_ID)):
+        BACKEND_STATUS[kind] = "PROBING"
+        BACKEND_PROBES[kind] = threading.Thread(
+            target=probe_backend, args=(kind, space_id, WARM_STOP), daemon=True
+        )
+        BACKEND_PROBES[kind].start()
+    if login:
+        WARM_SESSION = threading.Thread(target=warm_up_session, args=(preferences, WARM_STOP), daemon=True)
+        WARM_SESSION.start()
+
+def stop_warm_up():
+    """End the warm-up of a run; a login still in progress quits its own driver"""
+    global WARM_SESSION
+    if WARM_STOP is not None:
+        WARM_STOP.set()
+    # Probes stop at their next check, before the run's cassette is closed
+    for probe in BACKEND_PROBES.values():
+        probe.join()
+    BACKEND_PROBES.clear()
+    WARM_SESSION = None
+
+def wait_for_backend(kind):
+    """Wait for a warm-up probe and the warm-up login; only stages with work to send should call this"""
+    global WARM_SESSION
+    probe = BACKEND_PROBES.pop(kind, None)
+    if probe is not None:
+        probe.join()
+    session, WARM_SESSION = WARM_SESSION, None
+    if session is not None:
+        session.join()
+
+def warm_up_session(preferences, stop):
+    """Log in to HuggingFace and open the image Space ahead of the image step"""
+    global ACTIVE_DRIVER, WARM_IMAGE_DRIVER
+    def set_status(status):
+        if not stop.is_set():
+            BACKEND_STATUS["session"] = status
+    
+    if ACTIVE_DRIVER is not None:
+        return
+    set_status("LOGGING IN")
+    driver = None
+    space_open = False
+    try:
+        driver = backends.login_huggingface(
+            preferences.huggingface_username,
+            preferences.huggingface_password
+        )
+        if driver is None:
+            set_status("LOGIN FAILED")
+            return
+        backends.open_image_space(driver)
+        space_open = True
+        set_status("READY")
+    except Exception as e:
+        # The image step opens the Space itself if the warm-up did not get there
+        print(f"Error during warm-up: {e}")
+        set_status("ERROR")
+    finally:
+        if driver is not None:
+            with WARM_LOCK:
+                if stop.is_set() or ACTIVE_DRIVER is not None:
+                    # The run ended, or a step logged in itself, before the warm-up finished
+                    driver.quit()
+                else:
+                    ACTIVE_DRIVER = driver
+                    if space_open:
+                        WARM_IMAGE_DRIVER = driver
+
+# === Cassettes ===
+@contextlib.contextmanager
+def cassette_session(preferences, allow_record=True):
+    """Record or replay backend calls for the duration of the block, as set in the preferences
+
+    Recording is only allowed for whole runs, since each session rewrites the cassette.
+    """
+    if preferences.cassette_mode == 'OFF' or backends.ACTIVE_CASSETTE is not None:
+        # Nested steps of a full run share the cassette of the run
+        yield
+        return
+
+    path = bpy.path.abspath(preferences.cassette_path) if preferences.cassette_path else ""
+    if preferences.cassette_mode == 'RECORD':
+        if not allow_record:
+            raise CassetteError("Recording a cassette needs Generate Complete Scene; single steps can only replay")
+        # Check the path up front so a finished recording is not lost when it is saved
+        if not path or os.path.isdir(path) or not os.path.isdir(os.path.dirname(path)):
+            raise CassetteError(f"Cannot record to cassette file '{path}'. Set a file in an existing folder.")
+        cassette = Cassette(path, 'RECORD')
+    else:
+        cassette = Cassette.load(path, preferences.replay_speed)
+
+    backends.set_cassette(cassette)
+    try:
+        yield
+    finally:
+        backends.set_cassette(None)
+        cassette.save()
+        print(f"Cassette {cassette.summary()}")
+
+def with_cassette(method):
+    """Run an operator method inside a cassette session, replaying only when run on its own"""
+    @functools.wraps(method)
+    def wrapper(self, context):
+        preferences = context.preferences.addons[__name__].preferences
+        with contextlib.ExitStack() as stack:
+            try:
+                stack.enter_context(cassette_session(preferences, allow_record=False))
+            except CassetteError as e:
+                self.report({'ERROR'}, str(e))
+                return {'CANCELLED'}
+            return method(self, context)
+    return wrapper
 
 # === Addon Preferences ===
 class AISceneGeneratorPreferences(AddonPreferences):
@@ -70,6 +643,71 @@ class AISceneGeneratorPreferences(AddonPreferences):
         subtype='PASSWORD'
     )
     
+    workspace_root: StringProperty(
+        name="Workspace Folder",
+        description="Folder for run workspaces and the shared asset cache (defaults to the system temp folder)",
+        default="",
+        subtype='DIR_PATH'
+    )
+    
+    workspace_max_age_days: IntProperty(
+        name="Keep Runs (Days)",
+        description="Delete run workspaces and cached assets older than this",
+        default=7,
+        min=1
+    )
+    
+    workspace_max_size_mb: IntProperty(
+        name="Workspace Size Limit (MB)",
+        description="Delete the oldest runs and cached assets when the workspace grows beyond this",
+        default=2048,
+        min=100
+    )
+    
+    reuse_cached_assets: BoolProperty(
+        name="Reuse Cached Assets",
+        description="Reuse images and models already generated for identical prompts and images",
+        default=True
+    )
+    
+    cassette_mode: EnumProperty(
+        name="Cassette Mode",
+        description="Record backend interactions to a cassette file, or replay them from one",
+        items=[
+            ('OFF', "Off", "Talk to the real backends"),
+            ('RECORD', "Record", "Record every backend request and response of Generate Complete Scene to the cassette"),
+            ('REPLAY', "Replay", "Answer backend requests from the cassette"),
+        ],
+        default='OFF'
+    )
+    
+    cassette_path: StringProperty(
+        name="Cassette File",
+        description="Cassette file to record to or replay from",
+        default="",
+        subtype='FILE_PATH'
+    )
+    
+    replay_speed: FloatProperty(
+        name="Replay Speed",
+        description="Speed factor for recorded timings during replay (0 replays without delays)",
+        default=1.0,
+        min=0.0
+    )
+    
+    use_worker_queue: BoolProperty(
+        name="Use Worker Queue",
+        description="Queue image and 3D jobs for worker.py processes instead of running them in Blender",
+        default=False
+    )
+    
+    worker_timeout_minutes: IntProperty(
+        name="Worker Timeout (Minutes)",
+        description="Stop waiting for workers after this long; unfinished jobs stay queued",
+        default=60,
+        min=1
+    )
+    
     def draw(self, context):
         layout = self.layout
         
@@ -84,6 +722,32 @@ class AISceneGeneratorPreferences(AddonPreferences):
         box.prop(self, "huggingface_username")
         box.prop(self, "huggingface_password")
         
+        # Workspace settings
+        box = layout.box()
+        box.label(text="Workspace Settings:")
+        box.prop(self, "workspace_root")
+        box.prop(self, "workspace_max_age_days")
+        box.prop(self, "workspace_max_size_mb")
+        box.prop(self, "reuse_cached_assets")
+        
+        # Cassette settings
+        box = layout.box()
+        box.label(text="Record / Replay:")
+        box.prop(self, "cassette_mode")
+        if self.cassette_mode != 'OFF':
+            box.prop(self, "cassette_path")
+        if self.cassette_mode == 'REPLAY':
+            box.prop(self, "replay_speed")
+        
+        # Worker queue settings
+        box = layout.box()
+        box.label(text="Worker Queue:")
+        box.prop(self, "use_worker_queue")
+        if self.use_worker_queue:
+            box.prop(self, "worker_timeout_minutes")
+            box.label(text=f"Start workers with: python worker.py --root \"{get_workspace_root(self)}\"")
+            box.label(text="Workers read HF_USERNAME and HF_PASSWORD from the environment.")
+        
         # Installation checks
         box = layout.box()
         box.label(text="Dependencies Status:")
@@ -146,6 +810,20 @@ class SceneGenProperties(PropertyGroup):
         max=25
     )
     
+    scene_variants: IntProperty(
+        name="Scene Variants",
+        description="Number of alternative scenes to generate in a single request",
+        default=1,
+        min=1,
+        max=5
+    )
+    
+    run_id: StringProperty(
+        name="Run ID",
+        description="Workspace of the most recent generation run",
+        default=""
+    )
+    
     generating: BoolProperty(
         default=False
     )
@@ -155,6 +833,26 @@ class SceneGenProperties(PropertyGroup):
         description="Import 3D models into the scene after generation",
         default=True
     )
+    
+    incremental: BoolProperty(
+        name="Incremental Update",
+        description="Keep unchanged objects from the previous run and only regenerate new or changed ones",
+        default=True
+    )
+    
+    consolidate_materials: BoolProperty(
+        name="Consolidate Materials",
+        description="Merge duplicate images and materials after import and pack compatible textures into atlases",
+        default=False
+    )
+    
+    atlas_max_size: IntProperty(
+        name="Atlas Size",
+        description="Maximum width and height of a texture atlas in pixels",
+        default=4096,
+        min=256,
+        max=16384
+    )
 
 # === Operators ===
 class SCENEGEN_OT_GenerateJSON(Operator):
@@ -162,196 +860,296 @@ class SCENEGEN_OT_GenerateJSON(Operator):
     bl_label = "Generate Scene JSON"
     bl_description = "Generate a JSON file using OpenAI based on scene description"
 
+    def request_json(self, client, prompt, schema_name, schema):
+        """Send a structured-output request and return the raw reply"""
+        def send():
+            response = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                response_format=json_schema_format(schema_name, schema),
+            )
+            return response.choices[0].message.content
+        return backends.record_call("openai", prompt, send)
+
+    def generate_scenes(self, client, scene_desc, count, variants, previous=None):
+        """Generate one or more scenes in a single request"""
+        if variants == 1:
+            prompt = f'Generate a scene with exactly {count} objects for: "{scene_desc}"'
+            if previous:
+                # Let the model keep what still fits so those assets can be reused
+                prompt += (
+                    f"\nPrevious scene objects: {json.dumps(previous['objects'])}\n"
+                    "Keep every previous object that still fits exactly as it is (same name, type, "
+                    "prompt and position). Only move, change, add or remove objects as the "
+                    "description and object count require."
+                )
+            return [parse_scene_reply(self.request_json(client, prompt, "scene", SCENE_SCHEMA))]
+
+        prompt = (
+            f'Generate {variants} different scenes, each with exactly {count} objects, '
+            f'for: "{scene_desc}"'
+        )
+        schema = {
+            "type": "object",
+            "properties": {"scenes": {"type": "array", "items": SCENE_SCHEMA}},
+            "required": ["scenes"],
+            "additionalProperties": False,
+        }
+        reply = self.request_json(client, prompt, "scenes", schema)
+        try:
+            scenes = json.loads(reply).get("scenes", [])
+        except (AttributeError, TypeError, ValueError):
+            scenes = []
+        scenes = [parse_scene_reply(json.dumps(scene)) for scene in scenes[:variants]]
+        while len(scenes) < variants:
+            scenes.append({"scene": "", "objects": []})
+        return scenes
+
+    def repair_scene(self, client, scene_desc, data, count):
+        """Regenerate only the invalid or missing objects of a scene"""
+        del data["objects"][count:]
+
+        for attempt in range(MAX_REPAIR_ATTEMPTS + 1):
+            invalid = validate_scene(data)
+            missing = count - len(data["objects"])
+            if not invalid and missing == 0:
+                return True
+            if attempt == MAX_REPAIR_ATTEMPTS:
+                break
+
+            print(f"Repairing {len(invalid)} invalid and {missing} missing objects")
+            valid_names = [
+                obj["name"] for index, obj in enumerate(data["objects"]) if index not in invalid
+            ]
+            problems = [
+                {"object": data["objects"][index], "problems": errors}
+                for index, errors in invalid.items()
+            ]
+            prompt = (
+                f'Scene: "{scene_desc}". Existing object names: {json.dumps(valid_names)}.\n'
+                f"Return {len(invalid) + missing} objects: first a corrected replacement for each "
+                f"of these invalid objects, in order: {json.dumps(problems, default=str)}\n"
+                f"then {missing} new objects that fit the scene. Names must not repeat."
+            )
+            schema = {
+                "type": "object",
+                "properties": {"objects": {"type": "array", "items": SCENE_OBJECT_SCHEMA}},
+                "required": ["objects"],
+                "additionalProperties": False,
+            }
+            replacements = parse_scene_reply(
+                self.request_json(client, prompt, "scene_objects", schema)
+            )["objects"]
+
+            for index, obj in zip(invalid, replacements):
+                data["objects"][index] = obj
+            data["objects"].extend(replacements[len(invalid):len(invalid) + missing])
+
+        return False
+
+    @with_cassette
     def execute(self, context):
         preferences = context.preferences.addons[__name__].preferences
         props = context.scene.scene_gen
         scene_desc = props.scene_prompt.strip()
         count = props.object_count
+        variants = props.scene_variants
 
         if not scene_desc:
             self.report({'ERROR'}, "Scene description cannot be empty.")
             return {'CANCELLED'}
         
-        if not preferences.openai_api_key:
+        if not preferences.openai_api_key and not backends.is_replaying():
             self.report({'ERROR'}, "OpenAI API key is not set. Please check the addon preferences.")
             return {'CANCELLED'}
 
         self.report({'INFO'}, "Generating JSON...")
         
-        # Create openai client
-        print("Using OpenAI API Key:", preferences.openai_api_key)
-        client = openai.OpenAI(api_key=preferences.openai_api_key)
-        
-        # Load example JSON
-        example_path = os.path.join(addon_dir, "example.json")
-        with open(example_path, 'r') as f:
-            example_json_format = f.read()
-            
-        # Create chat prompt
-        chat_prompt = f"""
-Please generate a JSON file with {count} objects based on the scene description:
-"{scene_desc}"
-Match the structure and field names exactly as shown in this example:
-{example_json_format}
-Each object should include a `prompt` field for text-to-image generation, describing the object in high-quality detail.
-Make sure:
-- Each prompt describes a **single, complete, and centered object**
-- The object should be **clearly separated from the background** (object-level focus)
-- Use words like "isolated," "on a plain white background," or "studio-lit" to ensure easy background removal
-- Avoid describing scenes or background elements
-- The object should have a **clear contour** and be **fully visible** (no parts cropped or occluded)
-Only return JSON. No extra explanation.
-"""
+        # Create openai client; replayed requests never reach it
+        client = None
+        if not backends.is_replaying():
+            print("Using OpenAI API Key:", preferences.openai_api_key)
+            client = openai.OpenAI(api_key=preferences.openai_api_key)
+
+        # Incremental updates build on the scene of the previous run
+        previous = None
+        previous_workspace = get_run_workspace(context)
+        if props.incremental and variants == 1 and previous_workspace:
+            if os.path.exists(previous_workspace.json_path):
+                with open(previous_workspace.json_path, 'r') as f:
+                    previous = json.load(f)
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": chat_prompt}],
-                temperature=0.7,
+            scenes = self.generate_scenes(client, scene_desc, count, variants, previous)
+
+            # Only the main scene is repaired; extra variants are kept if they came back valid
+            if not self.repair_scene(client, scene_desc, scenes[0], count):
+                self.report({'ERROR'}, "OpenAI returned an invalid scene that could not be repaired.")
+                return {'CANCELLED'}
+            extra = []
+            for index, data in enumerate(scenes[1:], start=2):
+                del data["objects"][count:]
+                if validate_scene(data) or len(data["objects"]) != count:
+                    print(f"Discarding invalid scene variant {index}")
+                    continue
+                extra.append(data)
+            scenes = scenes[:1] + extra
+            for data in scenes:
+                if not data.get("scene"):
+                    data["scene"] = "generated_scene"
+
+            # Every generated scene starts a new run with its own workspace
+            root = get_workspace_root(preferences)
+            removed = collect_workspaces(
+                root,
+                preferences.workspace_max_age_days,
+                preferences.workspace_max_size_mb,
+                keep=(props.run_id,)
             )
+            if removed:
+                print(f"Removed {removed} old workspace entries")
+            workspace = RunWorkspace.create(root)
+            # Keep the previous run locked too while this run may still copy from it
+            keep = (workspace.run_id,)
+            if previous:
+                previous_workspace.lock()
+                keep += (previous_workspace.run_id,)
+            release_run_locks(keep)
 
-            json_result = response.choices[0].message.content
-            
-            # Save JSON to temp directory
-            with open(JSON_FILE_PATH, 'w') as f:
-                f.write(json_result)
+            # Save JSON to the run workspace, extra variants next to the main scene
+            for index, data in enumerate(scenes):
+                path = workspace.json_path if index == 0 else workspace.variant_path(index + 1)
+                atomic_write(path, json.dumps(data, indent=2))
 
-            self.report({'INFO'}, f"Scene JSON saved to: {JSON_FILE_PATH}")
+            if previous:
+                diff = diff_scenes(previous, scenes[0])
+                diff["previous_run_id"] = previous_workspace.run_id
+                atomic_write(os.path.join(workspace.path, DIFF_FILE_NAME), json.dumps(diff, indent=2))
+                print(
+                    f"Scene diff: {len(diff['unchanged'])} unchanged, {len(diff['moved'])} moved, "
+                    f"{len(diff['changed'])} changed, {len(diff['added'])} added, "
+                    f"{len(diff['removed'])} removed"
+                )
+
+            props.run_id = workspace.run_id
+            if variants > 1:
+                self.report({'INFO'}, f"Kept {len(scenes)} of {variants} scene variants")
+            self.report({'INFO'}, f"Scene JSON saved to: {workspace.json_path}")
             return {'FINISHED'}
 
         except Exception as e:
             self.report({'ERROR'}, f"OpenAI API Error: {e}")
             return {'CANCELLED'}
 
+class SCENEGEN_OT_UseVariant(Operator):
+    bl_idname = "scenegen.use_variant"
+    bl_label = "Use Scene Variant"
+    bl_description = "Make a scene variant the main scene of the run; the current main scene takes its place"
+
+    variant: IntProperty(
+        name="Variant",
+        default=2,
+        min=2
+    )
+
+    def execute(self, context):
+        workspace = get_run_workspace(context)
+        
+        if workspace is None or not os.path.exists(workspace.variant_path(self.variant)):
+            self.report({'ERROR'}, f"Scene variant {self.variant} not found.")
+            return {'CANCELLED'}
+            
+        variant_path = workspace.variant_path(self.variant)
+        with open(workspace.json_path, 'r') as f:
+            main_scene = f.read()
+        with open(variant_path, 'r') as f:
+            atomic_write(workspace.json_path, f.read())
+        atomic_write(variant_path, main_scene)
+        
+        self.report({'INFO'}, f"Scene variant {self.variant} is now the main scene.")
+        return {'FINISHED'}
+
 class SCENEGEN_OT_GenerateImages(Operator):
     bl_idname = "scenegen.generate_images"
     bl_label = "Generate Images"
     bl_description = "Generate images from the scene description using HuggingFace"
 
-    def create_scene_folder(self):
-        """Create a Scene folder for storing generated images"""
-        if os.path.exists(SCENE_FOLDER):
-            shutil.rmtree(SCENE_FOLDER)
-        os.makedirs(SCENE_FOLDER)
-        return SCENE_FOLDER
-
-    def login_huggingface(self, username, password):
-        """Login to HuggingFace with provided credentials"""
-        options = webdriver.ChromeOptions()
-        prefs = {
-            'profile.default_content_setting_values': {
-                'notifications': 2
-            }
-        }
-        options.add_experimental_option('prefs', prefs)
-        options.add_argument("disable-infobars")
-        options.add_argument("--start-maximized")
-        
-        driver = webdriver.Chrome(options=options)
-        
-        url = "https://huggingface.co/login"
-        driver.get(url)
-        
-        time.sleep(2)
-        
-        try:
-            username_field = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.NAME, "username"))
-            )
-            password_field = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.NAME, "password"))
-            )
-            
-            username_field.clear()
-            username_field.send_keys(username)
-            
-            password_field.clear()
-            password_field.send_keys(password)
-            
-            login_button = driver.find_element(By.XPATH, "//button[@type='submit']")
-            login_button.click()
-            
-            time.sleep(2)
-            
-            return driver
-            
-        except Exception as e:
-            print(f"Error during login: {e}")
-            driver.quit()
-            return None
+    def create_scene_folder(self, workspace):
+        """Create the run's Scene folder for storing generated images"""
+        if os.path.exists(workspace.scene_folder):
+            shutil.rmtree(workspace.scene_folder)
+        os.makedirs(workspace.scene_folder)
+        return workspace.scene_folder
 
-    def generate_images_from_json(self, driver, json_file_path, scene_folder):
-        """Reads JSON file and generates images based on prompts"""
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-        
-        url = "https://huggingface.co/spaces/black-forest-labs/FLUX.1-schnell"
-        driver.get(url)
-        
-        time.sleep(5)
+    def generate_images_from_json(self, driver, workspace, pending):
+        """Generates images for the scene objects that still need one"""
+        global WARM_IMAGE_DRIVER
+        scene_folder = workspace.scene_folder
         
-        iframe = WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "space-iframe"))
-        )
-        driver.switch_to.frame(iframe)
+        if WARM_IMAGE_DRIVER is driver:
+            WARM_IMAGE_DRIVER = None
+        else:
+            backends.open_image_space(driver)
         
-        for obj in data["objects"]:
+        for obj in pending:
             name = obj["name"]
             prompt = obj["prompt"]
             
-            input_element = WebDriverWait(driver, 20).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[data-testid="textbox"]'))
-            )
-            
-            input_element.clear()
-            input_element.send_keys(prompt)
-            
-            run_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, 'button.lg.secondary.svelte-cmf5ev'))
-            )
-            run_button.click()
-            
-            time.sleep(5)
-            
-            img_element = WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'img.svelte-1pijsyv'))
-            )
-            
-            img_url = img_element.get_attribute('src')
+            img_url = backends.request_image(driver, prompt)
             
             try:
-                image_data = requests.get(img_url).content
+                image_data = backends.download(img_url)
                 
                 image_path = os.path.join(scene_folder, f"{name}.webp")
-                with open(image_path, 'wb') as img_file:
-                    img_file.write(image_data)
+                atomic_write(image_path, image_data)
+                workspace.store_cached(workspace.cache_path("images", prompt, ".webp"), image_data)
                 
-                time.sleep(3)
+                backends.pause(3)
                 
             except Exception as e:
                 print(f"Error saving image {name}: {e}")
         
         return True
 
+    @with_cassette
     def execute(self, context):
         global ACTIVE_DRIVER
         preferences = context.preferences.addons[__name__].preferences
         
-        if not os.path.exists(JSON_FILE_PATH):
+        workspace = get_run_workspace(context)
+        
+        if workspace is None or not os.path.exists(workspace.json_path):
             self.report({'ERROR'}, "JSON file not found. Generate JSON first.")
             return {'CANCELLED'}
             
-        if not preferences.huggingface_username or not preferences.huggingface_password:
+        if preferences.use_worker_queue:
+            self.create_scene_folder(workspace)
+            queued = enqueue_image_jobs(
+                JobQueue.in_root(workspace.root), workspace, preferences.reuse_cached_assets
+            )
+            self.report({'INFO'}, f"Queued {queued} image jobs for workers.")
+            return {'FINISHED'}
+            
+        if (not preferences.huggingface_username or not preferences.huggingface_password) and not backends.is_replaying():
             self.report({'ERROR'}, "HuggingFace credentials not set. Please check the addon preferences.")
             return {'CANCELLED'}
             
         self.report({'INFO'}, "Creating scene folder...")
-        scene_folder = self.create_scene_folder()
+        self.create_scene_folder(workspace)
+        pending = prepare_images(workspace, preferences.reuse_cached_assets)
+        
+        if not pending:
+            self.report({'INFO'}, "All images reused from previous runs.")
+            return {'FINISHED'}
+        
+        # The warm-up may still be logging in; only wait for it when there is work
+        wait_for_backend("image")
         
         # Check if we already have an active driver
         if ACTIVE_DRIVER is None:
             self.report({'INFO'}, "Logging in to HuggingFace...")
-            ACTIVE_DRIVER = self.login_huggingface(
+            ACTIVE_DRIVER = backends.login_huggingface(
                 preferences.huggingface_username,
                 preferences.huggingface_password
             )
@@ -359,7 +1157,7 @@ class SCENEGEN_OT_GenerateImages(Operator):
         if ACTIVE_DRIVER:
             try:
                 self.report({'INFO'}, "Generating images from JSON...")
-                success = self.generate_images_from_json(ACTIVE_DRIVER, JSON_FILE_PATH, scene_folder)
+                success = self.generate_images_from_json(ACTIVE_DRIVER, workspace, pending)
                 
                 if success:
                     self.report({'INFO'}, "All images generated successfully!")
@@ -383,163 +1181,80 @@ class SCENEGEN_OT_Generate3DModels(Operator):
     bl_label = "Generate 3D Models"
     bl_description = "Convert generated images to 3D models using Stable Fast 3D"
 
-    def process_images_to_3d(self, driver, input_folder_path, output_folder_path, json_file_path):
+    def process_images_to_3d(self, driver, workspace, pending):
         """Upload each image to Stable Fast 3D, process it, and download the GLB file"""
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-        
-        name_mapping = {}
-        for obj in data["objects"]:
-            name_mapping[obj["name"]] = obj["name"]
-        
-        if not os.path.exists(output_folder_path):
-            os.makedirs(output_folder_path)
-        elif os.path.exists(output_folder_path):
-            shutil.rmtree(output_folder_path)
-            os.makedirs(output_folder_path)
+        backends.open_model_space(driver)
         
-        url = "https://huggingface.co/spaces/stabilityai/stable-fast-3d"
-        driver.get(url)
-        
-        time.sleep(5)
-        
-        webp_files = [os.path.join(input_folder_path, f) for f in os.listdir(input_folder_path) if f.endswith('.webp')]
-        
-        for webp_file in webp_files:
+        for name, webp_file, output_glb_path, cache_path in pending:
             file_name = os.path.basename(webp_file)
-            base_name = os.path.splitext(file_name)[0]
-            
-            if base_name in name_mapping:
-                object_name = name_mapping[base_name]
-                output_glb_path = os.path.join(output_folder_path, f"{object_name}.glb")
-            else:
-                output_glb_path = os.path.join(output_folder_path, f"{base_name}.glb")
             
             try:
-                iframe = WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "space-iframe"))
-                )
-                driver.switch_to.frame(iframe)
-                
-                file_upload = WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, 'input[type="file"]'))
-                )
-                
-                file_upload.send_keys(os.path.abspath(webp_file))
-                
-                remove_bg_button = WebDriverWait(driver, 30).until(
-                    EC.element_to_be_clickable((By.ID, "component-13"))
-                )
-                remove_bg_button.click()
-                
-                time.sleep(2)
-                
-                run_button = WebDriverWait(driver, 30).until(
-                    EC.element_to_be_clickable((By.ID, "component-13"))
-                )
-                run_button.click()
-
-                time.sleep(2)
-                
-                download_button = WebDriverWait(driver, 120).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, 'a[download][href*=".glb"] button'))
-                )
-                
-                download_link = driver.find_element(By.CSS_SELECTOR, 'a[download][href*=".glb"]')
-                download_url = download_link.get_attribute('href')
-                
-                response = requests.get(download_url)
-                with open(output_glb_path, 'wb') as f:
-                    f.write(response.content)
+                model_data = backends.request_model(driver, webp_file)
+                atomic_write(output_glb_path, model_data)
+                workspace.store_cached(cache_path, model_data)
                 
-                driver.switch_to.default_content()
-                driver.refresh()
-                time.sleep(3)
+                backends.reset_model_space(driver)
                 
             except Exception as e:
                 print(f"Error processing {file_name}: {e}")
                 try:
-                    driver.switch_to.default_content()
-                    driver.refresh()
-                    time.sleep(5)
+                    backends.reset_model_space(driver, settle_time=5)
                 except:
                     pass
         
         return True
 
-    def login_huggingface(self, username, password):
-        """Login to HuggingFace with provided credentials"""
-        options = webdriver.ChromeOptions()
-        prefs = {
-            'profile.default_content_setting_values': {
-                'notifications': 2
-            }
-        }
-        options.add_experimental_option('prefs', prefs)
-        options.add_argument("disable-infobars")
-        options.add_argument("--start-maximized")
-        
-        driver = webdriver.Chrome(options=options)
-        
-        url = "https://huggingface.co/login"
-        driver.get(url)
-        
-        time.sleep(2)
-        
-        try:
-            username_field = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.NAME, "username"))
-            )
-            password_field = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.NAME, "password"))
-            )
-            
-            username_field.clear()
-            username_field.send_keys(username)
-            
-            password_field.clear()
-            password_field.send_keys(password)
-            
-            login_button = driver.find_element(By.XPATH, "//button[@type='submit']")
-            login_button.click()
-            
-            time.sleep(5)
-            
-            return driver
-            
-        except Exception as e:
-            print(f"Error during login: {e}")
-            driver.quit()
-            return None
-
+    @with_cassette
     def execute(self, context):
         global ACTIVE_DRIVER
         preferences = context.preferences.addons[__name__].preferences
         
-        if not os.path.exists(JSON_FILE_PATH):
+        workspace = get_run_workspace(context)
+        
+        if workspace is None or not os.path.exists(workspace.json_path):
             self.report({'ERROR'}, "JSON file not found. Generate JSON first.")
             return {'CANCELLED'}
             
-        if not os.path.exists(SCENE_FOLDER) or not os.listdir(SCENE_FOLDER):
+        if not os.path.exists(workspace.scene_folder) or not os.listdir(workspace.scene_folder):
             self.report({'ERROR'}, "No images found. Generate images first.")
             return {'CANCELLED'}
             
-        if not preferences.huggingface_username or not preferences.huggingface_password:
+        if os.path.exists(workspace.models_folder):
+            shutil.rmtree(workspace.models_folder)
+        os.makedirs(workspace.models_folder)
+        
+        if preferences.use_worker_queue:
+            queued = enqueue_model_jobs(
+                JobQueue.in_root(workspace.root), workspace, preferences.reuse_cached_assets
+            )
+            self.report({'INFO'}, f"Queued {queued} 3D model jobs for workers.")
+            return {'FINISHED'}
+            
+        pending = prepare_models(workspace, preferences.reuse_cached_assets)
+        
+        if not pending:
+            self.report({'INFO'}, "All 3D models reused from previous runs.")
+            return {'FINISHED'}
+            
+        wait_for_backend("model")
+            
+        if (not preferences.huggingface_username or not preferences.huggingface_password) and not backends.is_replaying():
             self.report({'ERROR'}, "HuggingFace credentials not set. Please check the addon preferences.")
             return {'CANCELLED'}
             
         # Check if we already have an active driver
         if ACTIVE_DRIVER is None:
             self.report({'INFO'}, "Logging in to HuggingFace...")
-            ACTIVE_DRIVER = self.login_huggingface(
+            ACTIVE_DRIVER = backends.login_huggingface(
                 preferences.huggingface_username,
-                preferences.huggingface_password
+                preferences.huggingface_password,
+                settle_time=5
             )
         
         if ACTIVE_DRIVER:
             try:
                 self.report({'INFO'}, "Processing images to 3D models...")
-                success = self.process_images_to_3d(ACTIVE_DRIVER, SCENE_FOLDER, MODELS_FOLDER, JSON_FILE_PATH)
+                success = self.process_images_to_3d(ACTIVE_DRIVER, workspace, pending)
                 
                 if success:
                     self.report({'INFO'}, "All 3D models generated successfully!")
@@ -566,24 +1281,47 @@ class SCENEGEN_OT_ImportModels(Operator):
     bl_description = "Import generated 3D models into Blender scene"
 
     def execute(self, context):
-        if not os.path.exists(JSON_FILE_PATH):
+        workspace = get_run_workspace(context)
+        
+        if workspace is None or not os.path.exists(workspace.json_path):
             self.report({'ERROR'}, "JSON file not found.")
             return {'CANCELLED'}
             
-        if not os.path.exists(MODELS_FOLDER) or not os.listdir(MODELS_FOLDER):
+        if not os.path.exists(workspace.models_folder) or not os.listdir(workspace.models_folder):
             self.report({'ERROR'}, "No 3D models found. Generate 3D models first.")
             return {'CANCELLED'}
             
         # Load the JSON to get position data
-        with open(JSON_FILE_PATH, 'r') as file:
+        with open(workspace.json_path, 'r') as file:
             data = json.load(file)
             
+        # Objects imported by earlier runs, tagged with their scene object name
+        imported = {}
+        for scene_obj in context.scene.objects:
+            if scene_obj.get("scenegen_name"):
+                imported[scene_obj["scenegen_name"]] = scene_obj
+        
+        # Incremental updates drop removed and changed objects and keep the rest. Added
+        # objects are dropped too in case this run was imported before
+        diff = workspace.load_diff() if context.scene.scene_gen.incremental else None
+        if diff:
+            for name in diff["removed"] + diff["changed"] + diff["added"]:
+                if name in imported:
+                    bpy.data.objects.remove(imported.pop(name), do_unlink=True)
+            
         # Import each GLB model and place according to JSON positions
         for obj in data["objects"]:
             name = obj["name"]
             position = obj.get("position", {"x": 0, "y": 0, "z": 0})
             
-            model_path = os.path.join(MODELS_FOLDER, f"{name}.glb")
+            if diff and name in imported and name in diff["unchanged"] + diff["moved"]:
+                # Reuse the object already in the scene, only updating its position
+                imported[name].location = (
+                    position.get("x", 0), position.get("y", 0), position.get("z", 0)
+                )
+                continue
+            
+            model_path = os.path.join(workspace.models_folder, f"{name}.glb")
             
             if os.path.exists(model_path):
                 # Import the GLB file
@@ -600,6 +1338,7 @@ class SCENEGEN_OT_ImportModels(Operator):
                     
                     # Rename the object to match the JSON name
                     obj_import.name = name
+                    obj_import["scenegen_name"] = name
                 else:
                     self.report({'WARNING'}, f"Could not get imported object for {name}")
             else:
@@ -608,6 +1347,34 @@ class SCENEGEN_OT_ImportModels(Operator):
         self.report({'INFO'}, "All models imported successfully!")
         return {'FINISHED'}
 
+class SCENEGEN_OT_ConsolidateMaterials(Operator):
+    bl_idname = "scenegen.consolidate_materials"
+    bl_label = "Consolidate Materials"
+    bl_description = "Merge duplicate images and materials of imported models and pack their textures into atlases"
+
+    def execute(self, context):
+        props = context.scene.scene_gen
+        preferences = context.preferences.addons[__name__].preferences
+        objects = [obj for obj in context.scene.objects if obj.get("scenegen_name")]
+        
+        if not objects:
+            self.report({'ERROR'}, "No imported models found. Import models first.")
+            return {'CANCELLED'}
+            
+        # Atlases are cached per set of source textures in the shared cache
+        cache_folder = os.path.join(get_workspace_root(preferences), "cache", "atlases")
+        stats = consolidate.consolidate_materials(objects, props.atlas_max_size, cache_folder)
+        
+        message = (
+            f"Images: {stats['images_before']} -> {stats['images_after']}, "
+            f"materials: {stats['materials_before']} -> {stats['materials_after']}, "
+            f"atlases: {stats['atlases']}"
+        )
+        if stats["atlas_skipped"]:
+            message += f", {stats['atlas_skipped']} materials with textures larger than the atlas size left unpacked"
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+
 class SCENEGEN_OT_RunFullProcess(Operator):
     bl_idname = "scenegen.run_full_process"
     bl_label = "Generate Complete Scene"
@@ -619,8 +1386,15 @@ class SCENEGEN_OT_RunFullProcess(Operator):
     total_steps = 4
     process_complete = False
     error_message = ""
+    queue_status = ""
     
     def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS' and not self._cancel.is_set():
+            # Steps already running finish first; waiting for workers stops right away
+            self._cancel.set()
+            self.report({'INFO'}, "Cancelling scene generation...")
+            return {'RUNNING_MODAL'}
+            
         if event.type == 'TIMER':
             props = context.scene.scene_gen
             
@@ -652,6 +1426,7 @@ class SCENEGEN_OT_RunFullProcess(Operator):
         self.current_step = 0
         self.process_complete = False
         self.error_message = ""
+        self._cancel = threading.Event()
         
         # Start timer for modal
         wm = context.window_manager
@@ -668,25 +1443,93 @@ class SCENEGEN_OT_RunFullProcess(Operator):
         wm = context.window_manager
         wm.event_timer_remove(self._timer)
         
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise RuntimeError("Scene generation cancelled")
+    
+    def run_queued_stages(self, context):
+        """Queue chained image and 3D jobs for the current run and wait for the workers"""
+        preferences = context.preferences.addons[__name__].preferences
+        workspace = get_run_workspace(context)
+        if workspace is None or not os.path.exists(workspace.json_path):
+            raise RuntimeError("JSON file not found. Generate JSON first.")
+        
+        for folder in (workspace.scene_folder, workspace.models_folder):
+            if os.path.exists(folder):
+                shutil.rmtree(folder)
+            os.makedirs(folder)
+        
+        queue = JobQueue.in_root(workspace.root)
+        enqueue_image_jobs(queue, workspace, preferences.reuse_cached_assets, chain=True)
+        
+        def show_progress(counts):
+            total = sum(counts.values())
+            finished = counts["done"] + counts["failed"]
+            # The panel reads progress from the class, not the running instance
+            type(self).queue_status = f"Workers: {finished} of {total} jobs finished"
+        
+        try:
+            counts = queue.wait_for_run(
+                workspace.run_id,
+                on_progress=show_progress,
+                timeout=preferences.worker_timeout_minutes * 60,
+                claim_timeout=WORKER_CLAIM_TIMEOUT,
+                cancel=self._cancel,
+            )
+        except QueueWaitError as e:
+            raise RuntimeError(
+                f"{e}: {e.counts['queued']} jobs still queued, {e.counts['leased']} running. "
+                "They stay queued for worker.py; run Import Models once they finish."
+            ) from e
+        finally:
+            type(self).queue_status = ""
+        
+        for stage, name, error in queue.run_errors(workspace.run_id):
+            print(f"Worker {stage} job for {name} failed: {error}")
+        if counts["failed"]:
+            print(f"{counts['failed']} worker jobs failed; importing the models that finished")
+    
     def run_process(self, context):
         global ACTIVE_DRIVER
+        preferences = context.preferences.addons[__name__].preferences
         try:
-            # Step 1: Generate JSON
-            self.current_step = 1
-            bpy.ops.scenegen.generate_json('EXEC_DEFAULT')
-            
-            # Step 2: Generate Images
-            self.current_step = 2
-            bpy.ops.scenegen.generate_images('EXEC_DEFAULT')
-            
-            # Step 3: Generate 3D Models
-            self.current_step = 3
-            bpy.ops.scenegen.generate_3d_models('EXEC_DEFAULT')
+            with cassette_session(preferences):
+                # Wake the Spaces and log in while the LLM writes the scene JSON;
+                # the image and 3D steps only wait for this when they have work
+                start_warm_up(
+                    preferences,
+                    login=(not preferences.use_worker_queue
+                           and bool(preferences.huggingface_username and preferences.huggingface_password))
+                )
+                try:
+                    # Step 1: Generate JSON
+                    self.current_step = 1
+                    bpy.ops.scenegen.generate_json('EXEC_DEFAULT')
+                    self.check_cancelled()
+                
+                    if preferences.use_worker_queue:
+                        # Steps 2 and 3: Workers generate images and 3D models
+                        self.current_step = 2
+                        self.run_queued_stages(context)
+                    else:
+                        # Step 2: Generate Images
+                        self.current_step = 2
+                        bpy.ops.scenegen.generate_images('EXEC_DEFAULT')
+                        self.check_cancelled()
+                    
+                        # Step 3: Generate 3D Models
+                        self.current_step = 3
+                        bpy.ops.scenegen.generate_3d_models('EXEC_DEFAULT')
+                    self.check_cancelled()
+                finally:
+                    stop_warm_up()
             
-            # Step 4: Import Models (optional)
-            if context.scene.scene_gen.import_models:
-                self.current_step = 4
-                bpy.ops.scenegen.import_models('EXEC_DEFAULT')
+                # Step 4: Import Models (optional)
+                if context.scene.scene_gen.import_models:
+                    self.current_step = 4
+                    bpy.ops.scenegen.import_models('EXEC_DEFAULT')
+                    if context.scene.scene_gen.consolidate_materials:
+                        bpy.ops.scenegen.consolidate_materials('EXEC_DEFAULT')
                 
             self.process_complete = True
             
@@ -695,9 +1538,10 @@ class SCENEGEN_OT_RunFullProcess(Operator):
             self.process_complete = True
         finally:
             # Ensure driver is cleaned up when process completes
-            if ACTIVE_DRIVER:
-                ACTIVE_DRIVER.quit()
-                ACTIVE_DRIVER = None
+            with WARM_LOCK:
+                if ACTIVE_DRIVER:
+                    ACTIVE_DRIVER.quit()
+                    ACTIVE_DRIVER = None
 
 # === UI Panel ===
 class SCENEGEN_PT_MainPanel(Panel):
@@ -746,8 +1590,16 @@ class SCENEGEN_PT_MainPanel(Panel):
         row.label(text="Number of objects:")
         row.prop(props, "object_count", text="")
         
+        row = layout.row()
+        row.label(text="Scene variants:")
+        row.prop(props, "scene_variants", text="")
+        
         # Import option
         layout.prop(props, "import_models")
+        layout.prop(props, "incremental")
+        layout.prop(props, "consolidate_materials")
+        if props.consolidate_materials:
+            layout.prop(props, "atlas_max_size")
 
         # Generate buttons
         layout.separator()
@@ -772,6 +1624,17 @@ class SCENEGEN_PT_MainPanel(Panel):
                 for i, step_name in enumerate(steps):
                     icon = 'CHECKMARK' if progress_op.current_step > i else 'BLANK1'
                     col.label(text=step_name, icon=icon)
+                
+                if progress_op.queue_status:
+                    box.label(text=progress_op.queue_status, icon='TIME')
+                
+                # Backend readiness from the warm-up probes
+                labels = {"image": "Image backend", "model": "3D backend", "session": "HuggingFace session"}
+                for key, label in labels.items():
+                    if key in BACKEND_STATUS:
+                        ready = BACKEND_STATUS[key] == "READY" or backends.is_space_running(BACKEND_STATUS[key])
+                        icon = 'CHECKMARK' if ready else 'TIME'
+                        box.label(text=f"{label}: {BACKEND_STATUS[key]}", icon=icon)
         else:
             # Full process button
             row = layout.row()
@@ -786,6 +1649,17 @@ class SCENEGEN_PT_MainPanel(Panel):
             col.operator("scenegen.generate_images", icon='IMAGE_DATA')
             col.operator("scenegen.generate_3d_models", icon='MESH_DATA')
             col.operator("scenegen.import_models", icon='IMPORT')
+            col.operator("scenegen.consolidate_materials", icon='MATERIAL')
+            
+            # Extra scene variants of the current run
+            workspace = get_run_workspace(context)
+            indices = workspace.variant_indices() if workspace else []
+            if indices:
+                box = layout.box()
+                box.label(text="Scene Variants:")
+                row = box.row(align=True)
+                for index in indices:
+                    row.operator("scenegen.use_variant", text=f"Use {index}").variant = index
 
 # === Register ===
 classes = (
@@ -794,9 +1668,11 @@ classes = (
     SCENEGEN_OT_InstallSelenium,
     SceneGenProperties,
     SCENEGEN_OT_GenerateJSON,
+    SCENEGEN_OT_UseVariant,
     SCENEGEN_OT_GenerateImages,
     SCENEGEN_OT_Generate3DModels,
     SCENEGEN_OT_ImportModels,
+    SCENEGEN_OT_ConsolidateMaterials,
     SCENEGEN_OT_RunFullProcess,
     SCENEGEN_PT_MainPanel,
 )
@@ -807,6 +1683,7 @@ def register():
     bpy.types.Scene.scene_gen = PointerProperty(type=SceneGenProperties)
 
 def unregister():
+    release_run_locks()
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.scene_gen
@@ -0,0 +1,271 @@
+"""HuggingFace Space automation shared by the Blender operators and worker.py.
+
+This module must not import bpy so that it can run in a standalone worker process.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import functools
+import requests
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    SELENIUM_AVAILABLE = True
+except ImportError:
+    SELENIUM_AVAILABLE = False
+
+IMAGE_SPACE_ID = "black-forest-labs/FLUX.1-schnell"
+MODEL_SPACE_ID = "stabilityai/stable-fast-3d"
+IMAGE_SPACE_URL = f"https://huggingface.co/spaces/{IMAGE_SPACE_ID}"
+MODEL_SPACE_URL = f"https://huggingface.co/spaces/{MODEL_SPACE_ID}"
+SPACE_RUNTIME_URL = "https://huggingface.co/api/spaces/{}/runtime"
+
+# Runtime stages after which a Space will not become ready on its own
+SPACE_FAILED_STAGES = {"BUILD_ERROR", "RUNTIME_ERROR", "CONFIG_ERROR", "NO_APP_FILE", "PAUSED", "STOPPED"}
+
+# Cassette recording or replaying backend calls, see cassette.py
+ACTIVE_CASSETTE = None
+
+def set_cassette(cassette):
+    global ACTIVE_CASSETTE
+    ACTIVE_CASSETTE = cassette
+
+def is_replaying():
+    return ACTIVE_CASSETTE is not None and ACTIVE_CASSETTE.mode == "REPLAY"
+
+def record_call(kind, key, func):
+    """Run a backend call, through the active cassette if there is one"""
+    if ACTIVE_CASSETTE is None:
+        return func()
+    return ACTIVE_CASSETTE.call(kind, key, func)
+
+def recorded(kind, key=None):
+    """Decorate a backend function so the active cassette records or replays it"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if ACTIVE_CASSETTE is None:
+                return func(*args, **kwargs)
+            call_key = key(*args, **kwargs) if key else ""
+            return ACTIVE_CASSETTE.call(kind, call_key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def pause(seconds, stop=None):
+    """Wait between backend calls, returning early once the optional stop event is set
+
+    Replays skip the wait, since the recorded start offsets of the calls
+    already contain it, scaled by the replay speed.
+    """
+    if is_replaying():
+        return
+    if stop is not None:
+        stop.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def atomic_write(path, data):
+    """Write bytes or text to path so readers never see a partial file"""
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def cache_asset_path(cache_folder, kind, key, extension):
+    """Path of a shared cached asset, addressed by the hash of its key"""
+    digest = hashlib.sha256(key if isinstance(key, bytes) else key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_folder, kind, f"{digest[:32]}{extension}")
+
+@recorded("probe", key=lambda space_id, **kwargs: space_id)
+def probe_space(space_id, timeout=10):
+    """Return the runtime stage of a Space (e.g. RUNNING, SLEEPING, BUILDING), or None if unreachable"""
+    try:
+        response = requests.get(SPACE_RUNTIME_URL.format(space_id), timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("stage")
+    except (requests.RequestException, ValueError):
+        return None
+
+@recorded("wake", key=lambda space_id, **kwargs: space_id)
+def wake_space(space_id, timeout=10):
+    """Request the Space app itself, which starts a sleeping Space"""
+    host = space_id.replace("/", "-").replace(".", "-").replace("_", "-").lower()
+    try:
+        requests.get(f"https://{host}.hf.space", timeout=timeout)
+    except requests.RequestException:
+        pass
+
+def is_space_running(stage):
+    """RUNNING_BUILDING and RUNNING_APP_STARTING still serve the running app"""
+    return stage is not None and stage.startswith("RUNNING")
+
+def wait_until_ready(space_id, timeout=300, interval=5, on_status=None, stop=None):
+    """Wake a Space and poll its runtime until it is running, has failed, timeout passes
+    or the optional stop event is set
+
+    The probe is advisory: an unreachable runtime API ends the wait at once.
+    """
+    wake_space(space_id)
+    deadline = time.time() + timeout
+    while True:
+        if stop is not None and stop.is_set():
+            return None
+        stage = probe_space(space_id)
+        if on_status:
+            on_status(stage)
+        if stage is None or is_space_running(stage) or stage in SPACE_FAILED_STAGES or time.time() >= deadline:
+            return stage
+        if stage == "SLEEPING":
+            wake_space(space_id)
+        pause(interval, stop)
+
+@recorded("login", key=lambda username, *args, **kwargs: username)
+def login_huggingface(username, password, settle_time=2):
+    """Login to HuggingFace with provided credentials"""
+    options = webdriver.ChromeOptions()
+    prefs = {
+        'profile.default_content_setting_values': {
+            'notifications': 2
+        }
+    }
+    options.add_experimental_option('prefs', prefs)
+    options.add_argument("disable-infobars")
+    options.add_argument("--start-maximized")
+
+    driver = webdriver.Chrome(options=options)
+
+    url = "https://huggingface.co/login"
+    driver.get(url)
+
+    time.sleep(2)
+
+    try:
+        username_field = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.NAME, "username"))
+        )
+        password_field = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.NAME, "password"))
+        )
+
+        username_field.clear()
+        username_field.send_keys(username)
+
+        password_field.clear()
+        password_field.send_keys(password)
+
+        login_button = driver.find_element(By.XPATH, "//button[@type='submit']")
+        login_button.click()
+
+        time.sleep(settle_time)
+
+        return driver
+
+    except Exception as e:
+        print(f"Error during login: {e}")
+        driver.quit()
+        return None
+
+@recorded("open_image_space")
+def open_image_space(driver):
+    """Open the FLUX.1-schnell Space and switch into its app iframe"""
+    driver.get(IMAGE_SPACE_URL)
+
+    time.sleep(5)
+
+    iframe = WebDriverWait(driver, 20).until(
+        EC.presence_of_element_located((By.CLASS_NAME, "space-iframe"))
+    )
+    driver.switch_to.frame(iframe)
+
+@recorded("image", key=lambda driver, prompt: prompt)
+def request_image(driver, prompt):
+    """Run a prompt through the open image Space and return the result image URL"""
+    input_element = WebDriverWait(driver, 20).until(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[data-testid="textbox"]'))
+    )
+
+    input_element.clear()
+    input_element.send_keys(prompt)
+
+    run_button = WebDriverWait(driver, 10).until(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, 'button.lg.secondary.svelte-cmf5ev'))
+    )
+    run_button.click()
+
+    time.sleep(5)
+
+    img_element = WebDriverWait(driver, 30).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, 'img.svelte-1pijsyv'))
+    )
+
+    return img_element.get_attribute('src')
+
+@recorded("download", key=lambda url: url)
+def download(url):
+    """Fetch the content behind a result URL"""
+    return requests.get(url).content
+
+@recorded("open_model_space")
+def open_model_space(driver):
+    """Open the Stable Fast 3D Space"""
+    driver.get(MODEL_SPACE_URL)
+
+    time.sleep(5)
+
+@recorded("model", key=lambda driver, image_path: file_digest(image_path))
+def request_model(driver, image_path):
+    """Upload an image to the open Stable Fast 3D Space and return the GLB content"""
+    iframe = WebDriverWait(driver, 20).until(
+        EC.presence_of_element_located((By.CLASS_NAME, "space-iframe"))
+    )
+    driver.switch_to.frame(iframe)
+
+    file_upload = WebDriverWait(driver, 20).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, 'input[type="file"]'))
+    )
+
+    file_upload.send_keys(os.path.abspath(image_path))
+
+    remove_bg_button = WebDriverWait(driver, 30).until(
+        EC.element_to_be_clickable((By.ID, "component-13"))
+    )
+    remove_bg_button.click()
+
+    time.sleep(2)
+
+    run_button = WebDriverWait(driver, 30).until(
+        EC.element_to_be_clickable((By.ID, "component-13"))
+    )
+    run_button.click()
+
+    time.sleep(2)
+
+    WebDriverWait(driver, 120).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, 'a[download][href*=".glb"] button'))
+    )
+
+    download_link = driver.find_element(By.CSS_SELECTOR, 'a[download][href*=".glb"]')
+    return download(download_link.get_attribute('href'))
+
+@recorded("reset_model_space")
+def reset_model_space(driver, settle_time=3):
+    """Reload the Stable Fast 3D Space for the next upload"""
+    driver.switch_to.default_content()
+    driver.refresh()
+    time.sleep(settle_time)
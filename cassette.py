@@ -0,0 +1,168 @@
+"""Record and replay backend interactions for offline, repeatable pipeline runs.
+
+A cassette is a zip file holding index.json, with one entry per backend call
+(kind, key, start offset, duration, result or error), and the binary results
+deduplicated by hash under artifacts/. This module must not import bpy.
+"""
+
+import io
+import json
+import time
+import zipfile
+import hashlib
+import threading
+
+try:
+    from .backends import atomic_write
+except ImportError:
+    # Loaded as a top-level module by worker.py
+    from backends import atomic_write
+
+INDEX_NAME = "index.json"
+ARTIFACT_FOLDER = "artifacts/"
+CASSETTE_VERSION = 1
+
+class CassetteError(Exception):
+    pass
+
+class ReplayedError(CassetteError):
+    """A backend error recorded on the cassette, raised again during replay"""
+
+class ReplayDriver:
+    """Stand-in for the Selenium driver while replaying"""
+
+    def quit(self):
+        pass
+
+class Cassette:
+    """Backend calls recorded during a real run, or being replayed from one"""
+
+    def __init__(self, path, mode, speed=1.0):
+        if mode not in ("RECORD", "REPLAY"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.entries = []
+        self.artifacts = {}
+        self.used = set()
+        self.mismatches = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @classmethod
+    def load(cls, path, speed=1.0):
+        cassette = cls(path, "REPLAY", speed)
+        try:
+            with zipfile.ZipFile(path, 'r') as archive:
+                index = json.loads(archive.read(INDEX_NAME))
+                for name in archive.namelist():
+                    if name.startswith(ARTIFACT_FOLDER) and name != ARTIFACT_FOLDER:
+                        cassette.artifacts[name[len(ARTIFACT_FOLDER):]] = archive.read(name)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            raise CassetteError(f"Cannot read cassette {path}: {e}") from e
+
+        if index.get("version") != CASSETTE_VERSION:
+            raise CassetteError(f"Unsupported cassette version: {index.get('version')}")
+        cassette.entries = index["entries"]
+        return cassette
+
+    def save(self):
+        """Write the recorded calls to the cassette file"""
+        if self.mode != "RECORD":
+            return
+        with self.lock:
+            index = {"version": CASSETTE_VERSION, "entries": list(self.entries)}
+            artifacts = dict(self.artifacts)
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(INDEX_NAME, json.dumps(index, indent=1))
+            for digest, data in artifacts.items():
+                archive.writestr(ARTIFACT_FOLDER + digest, data)
+        atomic_write(self.path, buffer.getvalue())
+
+    def call(self, kind, key, func):
+        """Run func through the cassette: record its outcome, or replay a recorded one"""
+        # Calls nested inside a recorded call are part of its result, not separate entries
+        if getattr(self.local, "depth", 0):
+            return func()
+
+        self.local.depth = 1
+        try:
+            if self.mode == "RECORD":
+                return self._record(kind, key, func)
+            return self._replay(kind, key)
+        finally:
+            self.local.depth = 0
+
+    def _record(self, kind, key, func):
+        entry = {"kind": kind, "key": key, "start": round(time.time() - self.started, 3)}
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            entry["duration"] = round(time.perf_counter() - started, 3)
+            entry["error"] = {"type": type(e).__name__, "message": str(e)}
+            with self.lock:
+                self.entries.append(entry)
+            raise
+        entry["duration"] = round(time.perf_counter() - started, 3)
+
+        with self.lock:
+            if isinstance(result, bytes):
+                digest = hashlib.sha256(result).hexdigest()
+                self.artifacts[digest] = result
+                entry["artifact"] = digest
+            elif result is None or isinstance(result, (str, int, float, bool, list, dict)):
+                entry["result"] = result
+            else:
+                # Live objects such as drivers cannot be stored, only their presence
+                entry["object"] = type(result).__name__
+            self.entries.append(entry)
+        return result
+
+    def _replay(self, kind, key):
+        with self.lock:
+            index = self._find(kind, key)
+            if index is None:
+                raise CassetteError(f"No recorded {kind} call left on the cassette")
+            self.used.add(index)
+            entry = self.entries[index]
+
+        if self.speed > 0:
+            # Start no earlier than the recorded offset, then take the recorded duration
+            delay = self.started + entry.get("start", 0) / self.speed - time.time()
+            time.sleep(max(delay, 0) + entry["duration"] / self.speed)
+
+        if "error" in entry:
+            raise ReplayedError(f"{entry['error']['type']}: {entry['error']['message']}")
+        if "artifact" in entry:
+            return self.artifacts[entry["artifact"]]
+        if "object" in entry:
+            return ReplayDriver()
+        return entry.get("result")
+
+    def _find(self, kind, key):
+        """Pick the first unused entry with the same key, else the next unused one of the kind"""
+        fallback = None
+        for index, entry in enumerate(self.entries):
+            if index in self.used or entry["kind"] != kind:
+                continue
+            if entry["key"] == key:
+                return index
+            if fallback is None:
+                fallback = index
+        if fallback is not None:
+            self.mismatches += 1
+        return fallback
+
+    def summary(self):
+        """Return a short description of the cassette for logs"""
+        if self.mode == "RECORD":
+            return f"recorded {len(self.entries)} calls to {self.path}"
+        return (
+            f"replayed {len(self.used)} of {len(self.entries)} calls from {self.path} "
+            f"({self.mismatches} matched by order only)"
+        )
@@ -0,0 +1,360 @@
+"""Material and texture consolidation for imported scene models.
+
+Byte-identical images and identical materials are merged first. Materials whose
+node trees only differ in their images are then combined into one material
+whose textures are packed into shared atlases, with the UVs of their meshes
+remapped into each material's atlas tile.
+"""
+
+import os
+import json
+import math
+import hashlib
+import tempfile
+
+import bpy
+import numpy as np
+
+# Pixels of edge padding around each atlas tile to avoid bleeding between tiles
+ATLAS_PADDING = 4
+ATLAS_PREFIX = "SceneGen_Atlas"
+# Tolerance for UVs that sit just outside the 0-1 range
+UV_EPSILON = 1e-3
+
+def collect_mesh_objects(objects):
+    """Return the mesh objects among objects and their descendants"""
+    meshes = []
+    seen = set()
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if obj.name in seen:
+            continue
+        seen.add(obj.name)
+        if obj.type == 'MESH':
+            meshes.append(obj)
+        stack.extend(obj.children)
+    return meshes
+
+def used_materials(mesh_objects):
+    materials = []
+    for obj in mesh_objects:
+        for slot in obj.material_slots:
+            if slot.material and slot.material not in materials:
+                materials.append(slot.material)
+    return materials
+
+def image_nodes(material):
+    """Image texture nodes of a material, in a stable order"""
+    if not material.use_nodes or not material.node_tree:
+        return []
+    nodes = [node for node in material.node_tree.nodes if node.type == 'TEX_IMAGE' and node.image]
+    return sorted(nodes, key=lambda node: node.name)
+
+def used_images(materials):
+    images = []
+    for material in materials:
+        for node in image_nodes(material):
+            if node.image not in images:
+                images.append(node.image)
+    return images
+
+def image_digest(image):
+    """Hash the content and color space of an image"""
+    digest = hashlib.sha256(image.colorspace_settings.name.encode("utf-8"))
+    path = bpy.path.abspath(image.filepath) if image.filepath else ""
+    if image.packed_file:
+        digest.update(bytes(image.packed_file.data))
+    elif path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    else:
+        pixels = np.empty(len(image.pixels), dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+        digest.update(f"{image.size[0]}x{image.size[1]}".encode("utf-8"))
+        digest.update(pixels.tobytes())
+    return digest.hexdigest()
+
+def dedupe_images(materials):
+    """Remap byte-identical images to a single copy, returning {image name: digest}"""
+    canonical = {}
+    for image in used_images(materials):
+        digest = image_digest(image)
+        if digest in canonical:
+            image.user_remap(canonical[digest])
+            bpy.data.images.remove(image)
+        else:
+            canonical[digest] = image
+    return {image.name: digest for digest, image in canonical.items()}
+
+def socket_value(socket):
+    value = socket.default_value
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, (int, bool, str)):
+        return value
+    return tuple(round(v, 4) for v in value)
+
+def material_signature(material, include_images=True):
+    """Describe a node-based material so that equal signatures render identically"""
+    tree = material.node_tree
+    nodes = []
+    for node in sorted(tree.nodes, key=lambda node: node.name):
+        inputs = tuple(
+            (socket.identifier, socket_value(socket))
+            for socket in node.inputs
+            if not socket.is_linked and hasattr(socket, "default_value")
+        )
+        settings = tuple(
+            getattr(node, attribute, None)
+            for attribute in ("interpolation", "extension", "uv_map", "space", "blend_type", "operation")
+        )
+        image = None
+        if node.type == 'TEX_IMAGE':
+            image = node.image.name if include_images and node.image else "*"
+        nodes.append((node.name, node.bl_idname, image, inputs, settings))
+
+    links = sorted(
+        (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier)
+        for link in tree.links
+    )
+    # Settings outside the node tree, such as glTF doubleSided and alphaCutoff; some are
+    # missing in newer Blender versions
+    settings = tuple(
+        getattr(material, attribute, None)
+        for attribute in (
+            "blend_method", "use_backface_culling", "alpha_threshold", "shadow_method", "show_transparent_back"
+        )
+    )
+    settings = tuple(round(value, 4) if isinstance(value, float) else value for value in settings)
+    return repr((settings, tuple(nodes), tuple(links)))
+
+def merge_materials(materials):
+    """Remap identical node-based materials to a single copy, returning the survivors"""
+    canonical = {}
+    survivors = []
+    for material in materials:
+        if not material.use_nodes or not material.node_tree:
+            survivors.append(material)
+            continue
+        signature = material_signature(material)
+        if signature in canonical:
+            material.user_remap(canonical[signature])
+            bpy.data.materials.remove(material)
+        else:
+            canonical[signature] = material
+            survivors.append(material)
+    return survivors
+
+def material_users(materials, mesh_objects):
+    """Return {material name: [mesh datablocks using it]}"""
+    users = {material.name: [] for material in materials}
+    for obj in mesh_objects:
+        for slot in obj.material_slots:
+            if slot.material and slot.material.name in users and obj.data not in users[slot.material.name]:
+                users[slot.material.name].append(obj.data)
+    return users
+
+def uv_coordinates(mesh):
+    layer = mesh.uv_layers.active
+    uvs = np.empty(len(layer.data) * 2, dtype=np.float32)
+    layer.data.foreach_get("uv", uvs)
+    return uvs.reshape(-1, 2)
+
+def is_atlas_compatible(material, meshes, mesh_objects):
+    """Check that a material's textures can move into an atlas tile without visual change"""
+    nodes = image_nodes(material)
+    if not nodes or not meshes:
+        return False
+
+    # Every mesh must use only this material so the whole UV layout can be remapped
+    for obj in mesh_objects:
+        if obj.data in meshes and len(obj.material_slots) != 1:
+            return False
+    if material.users != len(meshes) + (1 if material.use_fake_user else 0):
+        return False
+
+    uv_maps = set()
+    for node in nodes:
+        if min(node.image.size) == 0:
+            return False
+        vector = node.inputs["Vector"]
+        if vector.is_linked:
+            source = vector.links[0].from_node
+            if source.type != 'UVMAP':
+                return False
+            uv_maps.add(source.uv_map)
+
+    for mesh in meshes:
+        if not mesh.uv_layers.active:
+            return False
+        if uv_maps - {"", mesh.uv_layers.active.name}:
+            return False
+        uvs = uv_coordinates(mesh)
+        if uvs.size and (uvs.min() < -UV_EPSILON or uvs.max() > 1 + UV_EPSILON):
+            return False
+    return True
+
+def tile_pixels(image, size):
+    """Return image pixels resized to size x size as an RGBA array with edge padding"""
+    inner = size - 2 * ATLAS_PADDING
+    copy = image.copy()
+    try:
+        copy.scale(inner, inner)
+        pixels = np.empty(len(copy.pixels), dtype=np.float32)
+        copy.pixels.foreach_get(pixels)
+        channels = len(pixels) // (inner * inner)
+    finally:
+        bpy.data.images.remove(copy)
+
+    pixels = pixels.reshape(inner, inner, channels)
+    if channels < 3:
+        pixels = np.repeat(pixels[:, :, :1], 3, axis=2)
+    if pixels.shape[2] == 3:
+        pixels = np.concatenate([pixels, np.ones((inner, inner, 1), dtype=np.float32)], axis=2)
+    pad = ATLAS_PADDING
+    return np.pad(pixels, ((pad, pad), (pad, pad), (0, 0)), mode='edge')
+
+def save_atlas(atlas, path):
+    """Save an atlas image to the shared cache without exposing partial files"""
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp-", suffix=".png")
+    os.close(fd)
+    try:
+        atlas.filepath_raw = tmp_path
+        atlas.file_format = 'PNG'
+        atlas.save()
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    atlas.filepath_raw = path
+
+def tile_size(material):
+    """Atlas tile size holding the material's largest texture at full resolution"""
+    return max(max(node.image.size) for node in image_nodes(material)) + 2 * ATLAS_PADDING
+
+def split_atlas_batches(members, max_size):
+    """Split materials into batches that each fit one atlas without downscaling any texture
+
+    Returns (batches, skipped) where skipped materials have textures larger than an atlas.
+    """
+    # Similar texture sizes share an atlas so small textures are not blown up to large tiles
+    members = sorted(members, key=tile_size, reverse=True)
+    skipped = [material for material in members if tile_size(material) > max_size]
+    members = [material for material in members if tile_size(material) <= max_size]
+
+    batches = []
+    while members:
+        per_side = max_size // tile_size(members[0])
+        batches.append(members[:per_side * per_side])
+        members = members[per_side * per_side:]
+    return batches, skipped
+
+def build_atlases(members, users, digests, cache_folder):
+    """Pack the textures of structurally identical materials into one atlas per texture slot"""
+    slots = [node.name for node in image_nodes(members[0])]
+    columns = math.ceil(math.sqrt(len(members)))
+    rows = math.ceil(len(members) / columns)
+    cell = max(tile_size(material) for material in members)
+    width, height = columns * cell, rows * cell
+
+    # The atlas content only depends on the member images and the layout
+    layout = {
+        "images": [
+            [digests.get(node.image.name) or image_digest(node.image) for node in image_nodes(material)]
+            for material in members
+        ],
+        "grid": [columns, rows, cell, ATLAS_PADDING],
+    }
+    key = hashlib.sha256(json.dumps(layout).encode("utf-8")).hexdigest()[:32]
+    cache_paths = [os.path.join(cache_folder, key, f"{index}.png") for index in range(len(slots))]
+    cached = all(os.path.exists(path) for path in cache_paths)
+
+    atlases = []
+    for index, slot in enumerate(slots):
+        source = members[0].node_tree.nodes[slot].image
+        if cached:
+            atlas = bpy.data.images.load(cache_paths[index])
+            os.utime(cache_paths[index])
+        else:
+            pixels = np.zeros((height, width, 4), dtype=np.float32)
+            for position, material in enumerate(members):
+                column, row = position % columns, position // columns
+                image = material.node_tree.nodes[slot].image
+                pixels[row * cell:(row + 1) * cell, column * cell:(column + 1) * cell] = tile_pixels(image, cell)
+            atlas = bpy.data.images.new(ATLAS_PREFIX, width, height, alpha=True)
+            atlas.colorspace_settings.name = source.colorspace_settings.name
+            atlas.pixels.foreach_set(pixels.ravel())
+            save_atlas(atlas, cache_paths[index])
+        atlas.name = f"{ATLAS_PREFIX}_{key[:8]}_{index}"
+        atlas.colorspace_settings.name = source.colorspace_settings.name
+        atlas.pack()
+        atlases.append(atlas)
+
+    # Move each member's UVs into its tile, inside the padding
+    for position, material in enumerate(members):
+        column, row = position % columns, position // columns
+        scale = np.array([(cell - 2 * ATLAS_PADDING) / width, (cell - 2 * ATLAS_PADDING) / height], dtype=np.float32)
+        offset = np.array(
+            [(column * cell + ATLAS_PADDING) / width, (row * cell + ATLAS_PADDING) / height],
+            dtype=np.float32,
+        )
+        for mesh in users[material.name]:
+            uvs = np.clip(uv_coordinates(mesh), 0.0, 1.0) * scale + offset
+            mesh.uv_layers.active.data.foreach_set("uv", uvs.ravel())
+
+    # Point the first member at the atlases and fold the others into it
+    merged = members[0]
+    old_images = used_images(members)
+    for slot, atlas in zip(slots, atlases):
+        merged.node_tree.nodes[slot].image = atlas
+    for material in members[1:]:
+        material.user_remap(merged)
+        bpy.data.materials.remove(material)
+    merged.name = f"{ATLAS_PREFIX}_{key[:8]}"
+
+    for image in old_images:
+        if image.users == 0:
+            bpy.data.images.remove(image)
+    return atlases
+
+def consolidate_materials(objects, max_atlas_size=4096, cache_folder=None, use_atlas=True):
+    """Deduplicate images and materials of the given objects and pack compatible textures into atlases"""
+    mesh_objects = collect_mesh_objects(objects)
+    materials = used_materials(mesh_objects)
+    stats = {
+        "images_before": len(used_images(materials)),
+        "materials_before": len(materials),
+        "atlases": 0,
+        "atlas_skipped": 0,
+    }
+
+    digests = dedupe_images(materials)
+    materials = merge_materials(materials)
+
+    if use_atlas and cache_folder:
+        users = material_users(materials, mesh_objects)
+        groups = {}
+        for material in materials:
+            # Materials already on an atlas from an earlier pass keep their layout
+            if material.name.startswith(ATLAS_PREFIX):
+                continue
+            if is_atlas_compatible(material, users[material.name], mesh_objects):
+                groups.setdefault(material_signature(material, include_images=False), []).append(material)
+
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            batches, skipped = split_atlas_batches(members, max_atlas_size)
+            stats["atlas_skipped"] += len(skipped)
+            for batch in batches:
+                if len(batch) < 2:
+                    continue
+                stats["atlases"] += len(build_atlases(batch, users, digests, cache_folder))
+
+    materials = used_materials(mesh_objects)
+    stats["images_after"] = len(used_images(materials))
+    stats["materials_after"] = len(materials)
+    return stats
@@ -0,0 +1,220 @@
+"""SQLite-backed job queue shared by Blender and worker.py processes.
+
+Jobs are leased to one worker at a time. A worker keeps its lease alive with
+heartbeats; jobs whose lease expires are handed to another worker until they
+run out of attempts. This module must not import bpy.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import contextlib
+
+QUEUE_FILE_NAME = "jobs.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run_id, stage);
+"""
+
+class QueueWaitError(Exception):
+    """Waiting for a run stopped before all of its jobs finished"""
+
+    def __init__(self, message, counts):
+        super().__init__(message)
+        self.counts = counts
+
+def relative_path(root, path):
+    """Express a path inside the workspace root portably, for job payloads"""
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+def resolve_path(root, relative):
+    """Turn a payload path back into a path under this machine's workspace root"""
+    return os.path.join(root, *relative.split("/"))
+
+class JobQueue:
+    """Per-object image and 3D jobs stored in a SQLite database"""
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        # Payload paths are relative to the workspace root holding the queue
+        self.root = os.path.dirname(path)
+        self.timeout = timeout
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def in_root(cls, root):
+        return cls(os.path.join(root, QUEUE_FILE_NAME))
+
+    @contextlib.contextmanager
+    def connect(self):
+        # Autocommit connection; an unfinished transaction is rolled back on close
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _transaction(self, conn):
+        # Take the write lock up front so concurrent claims cannot race
+        conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, run_id, stage, name, payload, max_attempts=3):
+        """Queue a job, replacing a still-queued job for the same run object"""
+        now = time.time()
+        with self.connect() as conn:
+            self._transaction(conn)
+            conn.execute(
+                "DELETE FROM jobs WHERE run_id = ? AND stage = ? AND name = ? AND status = 'queued'",
+                (run_id, stage, name)
+            )
+            cursor = conn.execute(
+                "INSERT INTO jobs (run_id, stage, name, payload, max_attempts, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, stage, name, json.dumps(payload), max_attempts, now, now)
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+
+    def claim(self, worker_id, lease_seconds=60, stages=None):
+        """Lease the oldest available job to worker_id, or return None"""
+        now = time.time()
+        with self.connect() as conn:
+            self._transaction(conn)
+
+            # Jobs whose lease expired on their last attempt have failed for good
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), "
+                "lease_owner = NULL, updated = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now)
+            )
+
+            query = (
+                "SELECT * FROM jobs WHERE (status = 'queued' "
+                "OR (status = 'leased' AND lease_expires < ?))"
+            )
+            params = [now]
+            if stages:
+                query += f" AND stage IN ({', '.join('?' for _ in stages)})"
+                params.extend(stages)
+            row = conn.execute(query + " ORDER BY id LIMIT 1", params).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        return job
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=60):
+        """Extend a lease; returns False if the worker no longer holds the job"""
+        now = time.time()
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (now + lease_seconds, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id):
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', lease_owner = NULL, error = NULL, updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        """Record a failed attempt, requeueing the job if it has attempts left"""
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts "
+                "THEN 'queued' ELSE 'failed' END, "
+                "lease_owner = NULL, lease_expires = NULL, error = ?, updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (str(error), time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def run_status(self, run_id):
+        """Return job counts by status for a run"""
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        with self.connect() as conn:
+            for row in conn.execute(
+                "SELECT status, COUNT(*) AS count FROM jobs WHERE run_id = ? GROUP BY status",
+                (run_id,)
+            ):
+                counts[row["status"]] = row["count"]
+        return counts
+
+    def run_errors(self, run_id):
+        """Return (stage, name, error) for the failed jobs of a run"""
+        with self.connect() as conn:
+            return [
+                (row["stage"], row["name"], row["error"])
+                for row in conn.execute(
+                    "SELECT stage, name, error FROM jobs WHERE run_id = ? AND status = 'failed'",
+                    (run_id,)
+                )
+            ]
+
+    def wait_for_run(self, run_id, poll_interval=2.0, on_progress=None,
+                     timeout=None, claim_timeout=None, cancel=None):
+        """Block until no job of the run is queued or leased, returning final counts
+
+        Raises QueueWaitError when timeout seconds pass, when no worker has
+        claimed any job within claim_timeout seconds, or when the cancel event
+        is set. Jobs still queued stay in the queue for workers started later.
+        """
+        started = time.time()
+        while True:
+            counts = self.run_status(run_id)
+            if on_progress:
+                on_progress(counts)
+            if counts["queued"] == 0 and counts["leased"] == 0:
+                return counts
+
+            waited = time.time() - started
+            claimed = counts["leased"] + counts["done"] + counts["failed"]
+            if cancel is not None and cancel.is_set():
+                raise QueueWaitError("Stopped waiting for workers", counts)
+            if claim_timeout is not None and not claimed and waited >= claim_timeout:
+                raise QueueWaitError(f"No worker claimed a job within {claim_timeout:.0f} seconds", counts)
+            if timeout is not None and waited >= timeout:
+                raise QueueWaitError(f"Workers did not finish within {timeout:.0f} seconds", counts)
+
+            if cancel is not None:
+                cancel.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
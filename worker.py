@@ -0,0 +1,191 @@
+"""Standalone worker that processes image and 3D jobs queued by the Blender addon.
+
+Run one or more workers outside Blender, on this machine or any machine that
+sees the same workspace folder:
+
+    python worker.py --root /path/to/workspace
+
+HuggingFace credentials are read from the HF_USERNAME and HF_PASSWORD
+environment variables. The workspace folder is the one set in the addon
+preferences (by default <temp>/ai_scene_generator).
+"""
+
+import os
+import sys
+import socket
+import argparse
+import tempfile
+import threading
+import time
+import uuid
+
+import backends
+from jobqueue import JobQueue, relative_path, resolve_path
+from cassette import Cassette
+
+class Worker:
+    """Pulls jobs from the queue and runs them against the HuggingFace Spaces"""
+
+    def __init__(self, queue, worker_id, username, password, lease_seconds=120):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.username = username
+        self.password = password
+        self.lease_seconds = lease_seconds
+        self.driver = None
+        self.open_space = None
+
+    def ensure_space(self, stage):
+        """Log in once and open the Space needed for the job stage"""
+        if self.driver is None:
+            self.driver = backends.login_huggingface(self.username, self.password, settle_time=5)
+            if self.driver is None:
+                raise RuntimeError("Failed to login to HuggingFace")
+            self.open_space = None
+
+        if self.open_space != stage:
+            if stage == "image":
+                backends.open_image_space(self.driver)
+            else:
+                backends.open_model_space(self.driver)
+            self.open_space = stage
+
+    def reset_driver(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+        self.open_space = None
+
+    def resolve(self, relative):
+        """Payload paths are relative to the workspace root, which may be mounted elsewhere here"""
+        return resolve_path(self.queue.root, relative)
+
+    def run_image_job(self, job):
+        payload = job["payload"]
+        output_path = self.resolve(payload["output_path"])
+        cache_path = self.resolve(payload["cache_path"])
+        self.ensure_space("image")
+        image_data = backends.download(backends.request_image(self.driver, payload["prompt"]))
+        backends.atomic_write(output_path, image_data)
+        if not os.path.exists(cache_path):
+            backends.atomic_write(cache_path, image_data)
+
+        # Chained jobs go straight on to the 3D stage with the fresh image
+        model = payload.get("model")
+        if model:
+            model_cache_path = backends.cache_asset_path(
+                self.resolve(model["cache_folder"]), "models", image_data, ".glb"
+            )
+            model_payload = dict(
+                model,
+                image_path=payload["output_path"],
+                cache_path=relative_path(self.queue.root, model_cache_path),
+            )
+            self.queue.enqueue(job["run_id"], "model", job["name"], model_payload)
+
+    def run_model_job(self, job):
+        payload = job["payload"]
+        output_path = self.resolve(payload["output_path"])
+        cache_path = self.resolve(payload["cache_path"])
+        if payload.get("use_cache") and os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                backends.atomic_write(output_path, f.read())
+            return
+
+        self.ensure_space("model")
+        try:
+            model_data = backends.request_model(self.driver, self.resolve(payload["image_path"]))
+        finally:
+            backends.reset_model_space(self.driver)
+        backends.atomic_write(output_path, model_data)
+        if not os.path.exists(cache_path):
+            backends.atomic_write(cache_path, model_data)
+
+    def keep_alive(self, job, done):
+        """Heartbeat the job lease until done is set"""
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(job["id"], self.worker_id, self.lease_seconds):
+                print(f"Lost lease on job {job['id']}")
+                return
+
+    def process(self, job):
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self.keep_alive, args=(job, done), daemon=True)
+        heartbeat.start()
+        try:
+            if job["stage"] == "image":
+                self.run_image_job(job)
+            else:
+                self.run_model_job(job)
+            self.queue.complete(job["id"], self.worker_id)
+            print(f"Finished {job['stage']} job for {job['name']}")
+        except Exception as e:
+            print(f"Error in {job['stage']} job for {job['name']} (attempt {job['attempts']}): {e}")
+            self.queue.fail(job["id"], self.worker_id, e)
+            self.reset_driver()
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def run(self, poll_interval=2.0, once=False):
+        try:
+            while True:
+                job = self.queue.claim(self.worker_id, self.lease_seconds)
+                if job is None:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                self.process(job)
+        finally:
+            self.reset_driver()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI Scene Generator worker")
+    parser.add_argument(
+        "--root",
+        default=os.path.join(tempfile.gettempdir(), "ai_scene_generator"),
+        help="Workspace folder shared with the Blender addon",
+    )
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+    parser.add_argument("--lease", type=int, default=120, help="Job lease length in seconds")
+    parser.add_argument("--poll", type=float, default=2.0, help="Seconds between queue polls when idle")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument("--record", metavar="CASSETTE", help="Record backend calls to a cassette file")
+    cassette_group.add_argument("--replay", metavar="CASSETTE", help="Replay backend calls from a cassette file")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Speed factor for replayed timings, 0 for no delays")
+    args = parser.parse_args(argv)
+
+    username = os.environ.get("HF_USERNAME", "")
+    password = os.environ.get("HF_PASSWORD", "")
+    if not args.replay:
+        if not username or not password:
+            print("Set HF_USERNAME and HF_PASSWORD to your HuggingFace credentials.")
+            return 1
+        if not backends.SELENIUM_AVAILABLE:
+            print("Selenium is not installed.")
+            return 1
+
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, "RECORD")
+    elif args.replay:
+        cassette = Cassette.load(args.replay, args.replay_speed)
+    backends.set_cassette(cassette)
+
+    worker = Worker(JobQueue.in_root(args.root), args.worker_id, username, password, args.lease)
+    print(f"Worker {args.worker_id} polling {worker.queue.path}")
+    try:
+        worker.run(args.poll, args.once)
+    finally:
+        if cassette:
+            cassette.save()
+            print(f"Cassette {cassette.summary()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())